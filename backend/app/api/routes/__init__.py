@@ -1,7 +1,9 @@
 from fastapi import APIRouter
-from app.api.routes import auth, portfolio
+from app.api.routes import auth, portfolio, prices, quotes
 
 api_router = APIRouter(prefix="/api")
 
 api_router.include_router(auth.router)
 api_router.include_router(portfolio.router)
+api_router.include_router(prices.router)
+api_router.include_router(quotes.router)
@@ -1,16 +1,72 @@
+import asyncio
+from datetime import date
 from typing import Annotated
-from fastapi import APIRouter, Depends, Path, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Path,
+    Query,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.api.deps import CurrentUser
 from app.db import get_db
-from app.services.portfolio_service import backfill_portfolio_prices
+from app.schemas import DownsampleMethod, SeriesFormat
+from app.services import (
+    backfill_portfolio_prices,
+    portfolio_version,
+    get_cached_analysis,
+    store_analysis,
+    portfolio_value_history,
+    series_response,
+)
 
 router = APIRouter(prefix="/portfolios", tags=["Portfolios"])
 
+# Authenticated per-user data: browsers may keep it but must revalidate.
+ANALYZE_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag(version: str) -> str:
+    """Weak ETag for an analysis version.
+
+    Weak because the body differs between a fresh and a cached response
+    (the ``cached`` flag) while the underlying analysis is the same.
+    """
+    return f'W/"{version}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header value against ``etag``."""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    candidates = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidates or opaque in candidates
+
+
+def _ensure_owned(db: Session, portfolio_id: int, user_id: str) -> None:
+    """Raise 404 unless the portfolio belongs to the given user."""
+    row = db.execute(
+        text("SELECT id FROM portfolios WHERE id = :pid AND user_id = :uid"),
+        {"pid": portfolio_id, "uid": user_id},
+    ).fetchone()
+
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found",
+        )
+
 
 @router.get("/{portfolio_id}/analyze")
 async def analyze_portfolio(
+    request: Request,
+    response: Response,
     current_user: CurrentUser,
     db: Annotated[Session, Depends(get_db)],
     portfolio_id: int = Path(..., description="The portfolio ID to analyze"),
@@ -19,23 +75,84 @@ async def analyze_portfolio(
     Analyze a portfolio:
       Step 1 — backfill market_prices for every holding.
       Step 2 — (TODO) calculate profit/loss.
+
+    Responses carry an ETag derived from the portfolio's transactions and
+    stored prices; unchanged portfolios answer ``If-None-Match`` with 304
+    and are otherwise served from the in-process result cache (flagged
+    with ``"cached": true``). Results with failed downloads are never cached.
     """
     # Verify the portfolio belongs to the current user
-    row = db.execute(
-        text("SELECT id FROM portfolios WHERE id = :pid AND user_id = :uid"),
-        {"pid": portfolio_id, "uid": str(current_user.id)},
-    ).fetchone()
+    _ensure_owned(db, portfolio_id, str(current_user.id))
 
-    if row is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Portfolio not found",
+    version = portfolio_version(db, portfolio_id)
+    etag = _etag(version)
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": ANALYZE_CACHE_CONTROL},
         )
 
-    # Step 1: backfill prices
-    backfill_result = backfill_portfolio_prices(db, portfolio_id)
+    cached = get_cached_analysis(portfolio_id, version)
+    if cached is not None:
+        # Write counts describe the run that filled the cache, not this one.
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = ANALYZE_CACHE_CONTROL
+        return {**cached, "cached": True}
+
+    # Step 1: backfill prices. Off the event loop: it downloads from
+    # yfinance and may wait on another worker's ticker lock.
+    backfill_result = await asyncio.to_thread(
+        backfill_portfolio_prices, db, portfolio_id
+    )
 
-    return {
+    result = {
         "portfolio_id": portfolio_id,
         "backfill": backfill_result,
     }
+
+    if backfill_result.get("failed"):
+        # Some downloads came back empty: don't pin this result to a
+        # version (which wouldn't move) so the next request retries.
+        response.headers["Cache-Control"] = "no-store"
+        return {**result, "cached": False}
+
+    # The backfill itself moves market_prices forward, so key the
+    # result on the post-backfill version the next request will see.
+    version = portfolio_version(db, portfolio_id)
+    store_analysis(portfolio_id, version, result)
+
+    response.headers["ETag"] = _etag(version)
+    response.headers["Cache-Control"] = ANALYZE_CACHE_CONTROL
+    return {**result, "cached": False}
+
+
+@router.get("/{portfolio_id}/history")
+async def get_portfolio_history(
+    current_user: CurrentUser,
+    db: Annotated[Session, Depends(get_db)],
+    portfolio_id: int = Path(..., description="The portfolio ID"),
+    start: date | None = Query(None, description="First date (inclusive)"),
+    end: date | None = Query(None, description="Last date (inclusive)"),
+    points: int = Query(500, ge=3, le=5000, description="Target point count"),
+    method: DownsampleMethod = Query("lttb"),
+    fmt: SeriesFormat = Query("json", alias="format"),
+):
+    """Daily portfolio market value from stored prices, downsampled for charting.
+
+    Only dates already in ``market_prices`` are valued — run ``/analyze``
+    first to backfill them.
+    """
+    _ensure_owned(db, portfolio_id, str(current_user.id))
+
+    dates, values = portfolio_value_history(
+        db, portfolio_id, start, end, points, method
+    )
+    return series_response(
+        dates,
+        values,
+        fmt,
+        portfolio_id=portfolio_id,
+        method=method,
+        points=len(dates),
+    )
@@ -0,0 +1,28 @@
+from datetime import date
+from typing import Annotated
+from fastapi import APIRouter, Depends, Path, Query
+from sqlalchemy.orm import Session
+from app.api.deps import CurrentUser
+from app.db import get_db
+from app.schemas import DownsampleMethod, SeriesFormat
+from app.services import price_history, series_response
+
+router = APIRouter(prefix="/prices", tags=["Prices"])
+
+
+@router.get("/{ticker}/history")
+async def get_price_history(
+    current_user: CurrentUser,
+    db: Annotated[Session, Depends(get_db)],
+    ticker: str = Path(..., description="Full ticker, e.g. THYAO.IS"),
+    start: date | None = Query(None, description="First date (inclusive)"),
+    end: date | None = Query(None, description="Last date (inclusive)"),
+    points: int = Query(500, ge=3, le=5000, description="Target point count"),
+    method: DownsampleMethod = Query("lttb"),
+    fmt: SeriesFormat = Query("json", alias="format"),
+):
+    """Daily closes for a ticker, downsampled to about ``points`` points."""
+    dates, values = price_history(db, ticker, start, end, points, method)
+    return series_response(
+        dates, values, fmt, ticker=ticker, method=method, points=len(dates)
+    )
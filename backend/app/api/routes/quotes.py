@@ -0,0 +1,148 @@
+import asyncio
+import contextlib
+import json
+import logging
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from app.core.security import decode_access_token
+from app.db import SessionLocal
+from app.services import get_profile_by_id, held_tickers, LiveQuoteHub, Subscription
+
+router = APIRouter(prefix="/quotes", tags=["Quotes"])
+
+logger = logging.getLogger(__name__)
+
+# Seconds a client has to send its auth message after connecting.
+AUTH_TIMEOUT_SECONDS = 10.0
+
+
+def _authenticate(token: str) -> str | None:
+    """Return the user id for a valid token with a profile, else ``None``."""
+    user_id = decode_access_token(token)
+    if user_id is None:
+        return None
+
+    db = SessionLocal()
+    try:
+        if get_profile_by_id(db, user_id) is None:
+            return None
+        return user_id
+    finally:
+        db.close()
+
+
+def _held_tickers(user_id: str, portfolio_id: int | None) -> set[str]:
+    db = SessionLocal()
+    try:
+        return set(held_tickers(db, user_id=user_id, portfolio_id=portfolio_id))
+    finally:
+        db.close()
+
+
+async def _read_auth(websocket: WebSocket) -> tuple[str, int | None] | None:
+    """Read the ``{"token": ..., "portfolio_id": ...}`` auth message."""
+    try:
+        message = await asyncio.wait_for(websocket.receive(), AUTH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return None
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+
+    try:
+        payload = json.loads(message.get("text") or "")
+        token = payload["token"]
+        portfolio_id = payload.get("portfolio_id")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    if not isinstance(token, str):
+        return None
+    if portfolio_id is not None and not isinstance(portfolio_id, int):
+        return None
+    return token, portfolio_id
+
+
+async def _drain_client(websocket: WebSocket) -> None:
+    """Ignore client messages (text or binary) until it disconnects."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+async def _pump(websocket: WebSocket, subscription: Subscription) -> None:
+    while True:
+        quotes = await subscription.next_batch()
+        await websocket.send_json(
+            {"type": "update", "quotes": [q.model_dump(mode="json") for q in quotes]}
+        )
+
+
+@router.websocket("/ws")
+async def live_quotes(websocket: WebSocket):
+    """
+    Stream live quotes for the current user's held tickers.
+
+    The first client message must be ``{"token": "<supabase jwt>"}``,
+    optionally with ``"portfolio_id"`` to limit the stream to one portfolio.
+    The token travels in a frame rather than the URL so it never reaches
+    access logs. The server then sends a ``snapshot`` of every known quote,
+    and after that only tickers whose price changed as ``update`` messages.
+    Positions opened later join the stream on the hub's next poll.
+
+    Closes with 1013 (try again later) if the quote poller isn't running,
+    and with 1011 if sending updates fails while the client is connected.
+    """
+    await websocket.accept()
+
+    hub: LiveQuoteHub = websocket.app.state.quote_hub
+    if not hub.running:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    try:
+        auth = await _read_auth(websocket)
+    except WebSocketDisconnect:
+        return
+    user_id = await asyncio.to_thread(_authenticate, auth[0]) if auth else None
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    portfolio_id = auth[1]
+
+    tickers = await asyncio.to_thread(_held_tickers, user_id, portfolio_id)
+
+    # Subscribe before taking the snapshot so no change falls in between.
+    subscription = hub.subscribe(tickers, user_id, portfolio_id)
+    try:
+        await websocket.send_json(
+            {
+                "type": "snapshot",
+                "quotes": [q.model_dump(mode="json") for q in hub.snapshot(tickers)],
+            }
+        )
+    except WebSocketDisconnect:
+        hub.unsubscribe(subscription)
+        return
+
+    pump = asyncio.create_task(_pump(websocket, subscription))
+    client = asyncio.create_task(_drain_client(websocket))
+    try:
+        done, _ = await asyncio.wait(
+            {pump, client}, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        hub.unsubscribe(subscription)
+        for task in (pump, client):
+            task.cancel()
+        # Retrieve results so failures are never "exception never retrieved"
+        with contextlib.suppress(asyncio.CancelledError):
+            await asyncio.gather(pump, client, return_exceptions=True)
+
+    if pump in done and client not in done:
+        # The pump only stops by raising; the client is still connected.
+        error = pump.exception()
+        if isinstance(error, WebSocketDisconnect):
+            return
+        logger.error("Live quote pump failed", exc_info=error)
+        with contextlib.suppress(Exception):
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
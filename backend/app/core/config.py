@@ -9,6 +9,10 @@ class Settings(BaseSettings):
     # Supabase
     supabase_url: str
 
+    # Live quotes (one poller per API process)
+    live_quotes_enabled: bool = True
+    live_quote_interval_seconds: float = 15.0
+
     # CORS
     cors_origins: list[str] = [
         "http://localhost:5173",
@@ -1,14 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import get_settings
 from app.api import api_router
+from app.schemas import SERIES_HEADERS
+from app.services import LiveQuoteHub, YFinanceQuoteSource
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the live-quote poller for the lifetime of the process."""
+    hub = LiveQuoteHub(
+        YFinanceQuoteSource(),
+        interval_seconds=settings.live_quote_interval_seconds,
+    )
+    app.state.quote_hub = hub
+    if settings.live_quotes_enabled:
+        hub.start()
+    try:
+        yield
+    finally:
+        await hub.stop()
+
+
 app = FastAPI(
     title="Portfolio Tracker API",
     description="Backend API for the Portfolio Tracker application",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -18,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", *SERIES_HEADERS],
 )
 
 # Include routers
@@ -4,10 +4,16 @@ from app.schemas.auth import (
     UserResponse,
     ProfileUpdate,
 )
+from app.schemas.quotes import Quote
+from app.schemas.history import SeriesFormat, DownsampleMethod, SERIES_HEADERS
 
 __all__ = [
     "EmailCheckRequest",
     "EmailCheckResponse",
     "UserResponse",
     "ProfileUpdate",
+    "Quote",
+    "SeriesFormat",
+    "DownsampleMethod",
+    "SERIES_HEADERS",
 ]
@@ -0,0 +1,14 @@
+from typing import Literal
+
+# Query-parameter types shared by the price and portfolio history routes
+SeriesFormat = Literal["json", "binary"]
+DownsampleMethod = Literal["lttb", "minmax"]
+
+# Metadata headers sent with ``format=binary`` responses; listed so CORS
+# can expose them to the browser.
+SERIES_HEADERS = [
+    "X-Series-Ticker",
+    "X-Series-Portfolio-Id",
+    "X-Series-Method",
+    "X-Series-Points",
+]
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class Quote(BaseModel):
+    ticker: str
+    price: float
+    as_of: datetime
@@ -4,7 +4,25 @@ from app.services.user_service import (
     email_exists,
     update_profile,
 )
-from app.services.portfolio_service import backfill_portfolio_prices
+from app.services.portfolio_service import (
+    backfill_portfolio_prices,
+    portfolio_version,
+)
+from app.services.analysis_cache import get_cached_analysis, store_analysis
+from app.services.history_service import (
+    price_history,
+    portfolio_value_history,
+    encode_series_binary,
+    series_response,
+)
+from app.services.quote_service import (
+    LiveQuoteHub,
+    Subscription,
+    FakeQuoteSource,
+    YFinanceQuoteSource,
+    held_positions,
+    held_tickers,
+)
 
 __all__ = [
     "get_profile_by_id",
@@ -12,4 +30,17 @@ __all__ = [
     "email_exists",
     "update_profile",
     "backfill_portfolio_prices",
+    "portfolio_version",
+    "get_cached_analysis",
+    "store_analysis",
+    "price_history",
+    "portfolio_value_history",
+    "encode_series_binary",
+    "series_response",
+    "LiveQuoteHub",
+    "Subscription",
+    "FakeQuoteSource",
+    "YFinanceQuoteSource",
+    "held_positions",
+    "held_tickers",
 ]
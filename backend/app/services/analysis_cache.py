@@ -0,0 +1,37 @@
+"""
+In-process cache for portfolio analysis results.
+
+Entries are keyed on ``(portfolio_id, version)`` where ``version`` comes
+from :func:`app.services.portfolio_service.portfolio_version`. Any change
+to the portfolio's transactions or to the stored prices of its tickers
+produces a new version, so stale entries are simply never looked up again
+and fall off the end of the LRU.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+MAX_ENTRIES = 256
+
+_cache: OrderedDict[tuple[int, str], dict] = OrderedDict()
+_lock = Lock()
+
+
+def get_cached_analysis(portfolio_id: int, version: str) -> dict | None:
+    """Return the cached analysis for this portfolio version, if any."""
+    key = (portfolio_id, version)
+    with _lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+
+def store_analysis(portfolio_id: int, version: str, result: dict) -> None:
+    """Cache an analysis result, dropping older versions of the same portfolio."""
+    with _lock:
+        for key in [k for k in _cache if k[0] == portfolio_id]:
+            del _cache[key]
+        _cache[(portfolio_id, version)] = result
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
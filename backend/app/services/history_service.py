@@ -0,0 +1,306 @@
+"""
+Downsampled price and portfolio-value history for charts.
+
+Series are read from ``market_prices`` (and ``transactions`` for portfolio
+value), then reduced to roughly the requested number of points with one
+of two shape-preserving methods:
+
+* ``lttb``   — Largest-Triangle-Three-Buckets; keeps the points that
+  contribute most to the visual shape. Each bucket is a NumPy reduction.
+* ``minmax`` — keeps the minimum and maximum of every bucket, fully
+  vectorised; cheaper and guarantees peaks/troughs survive.
+
+Results are cached in-process per (ticker, range, resolution) and per
+(portfolio, version, range, resolution). Each ticker entry stores the
+ticker's price version (last date, row count and sum of closes), so new
+or re-split prices replace it on the next read.
+"""
+
+import struct
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+from fastapi import Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.schemas.history import SeriesFormat
+from app.services.portfolio_service import portfolio_version
+
+MAX_CACHE_ENTRIES = 512
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_cache: OrderedDict[tuple, tuple[str, list[date], list[float]]] = OrderedDict()
+_lock = Lock()
+
+
+# ------------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------------
+
+def price_history(
+    db: Session,
+    ticker: str,
+    start: date | None,
+    end: date | None,
+    points: int,
+    method: str = "lttb",
+) -> tuple[list[date], list[float]]:
+    """Downsampled daily closes for ``ticker`` between ``start`` and ``end``."""
+    version = _ticker_version(db, ticker)
+    key = ("ticker", ticker, start, end, points, method)
+    cached = _cache_get(key, version)
+    if cached is not None:
+        return cached
+
+    rows = db.execute(
+        text(
+            """
+            SELECT date, close FROM market_prices
+            WHERE ticker = :ticker
+              AND (CAST(:start AS date) IS NULL OR date >= :start)
+              AND (CAST(:end AS date) IS NULL OR date <= :end)
+            ORDER BY date
+            """
+        ),
+        {"ticker": ticker, "start": start, "end": end},
+    ).fetchall()
+
+    dates = [r[0] for r in rows]
+    values = np.array([float(r[1]) for r in rows], dtype=float)
+    series = _downsample_series(dates, values, points, method)
+    _cache_put(key, version, series)
+    return series
+
+
+def portfolio_value_history(
+    db: Session,
+    portfolio_id: int,
+    start: date | None,
+    end: date | None,
+    points: int,
+    method: str = "lttb",
+) -> tuple[list[date], list[float]]:
+    """Downsampled daily market value of the portfolio's holdings.
+
+    Value on a date is Σ quantity held × close, with each ticker's close
+    carried forward over days without a stored price.
+    """
+    version = portfolio_version(db, portfolio_id)
+    key = ("portfolio", portfolio_id, start, end, points, method)
+    cached = _cache_get(key, version)
+    if cached is not None:
+        return cached
+
+    values = _daily_portfolio_values(db, portfolio_id)
+    if start is not None:
+        values = values[values.index >= start]
+    if end is not None:
+        values = values[values.index <= end]
+
+    series = _downsample_series(
+        list(values.index), values.to_numpy(dtype=float), points, method
+    )
+    _cache_put(key, version, series)
+    return series
+
+
+def encode_series_binary(dates: list[date], values: list[float]) -> bytes:
+    """Pack a series as little-endian binary for the ``binary`` format.
+
+    Layout: ``uint32`` point count and ``uint32`` zero padding, then that
+    many ``float64`` values, then that many ``int32`` days since 1970-01-01.
+    Values are float64 so portfolio totals in the millions keep their cents,
+    and come first so both arrays can be viewed in place without copying
+    (offsets 8 and ``8 + 8 * count``).
+    """
+    vals = np.asarray(values, dtype="<f8")
+    days = np.array([d.toordinal() - _EPOCH_ORDINAL for d in dates], dtype="<i4")
+    return struct.pack("<II", len(dates), 0) + vals.tobytes() + days.tobytes()
+
+
+def series_response(
+    dates: list[date],
+    values: list[float],
+    fmt: SeriesFormat,
+    **meta,
+) -> Response | dict:
+    """Encode a downsampled series as columnar JSON or packed binary.
+
+    JSON is ``{**meta, "dates": [...], "values": [...]}``; binary is the
+    layout documented on :func:`encode_series_binary`, with ``meta`` sent
+    as ``X-Series-*`` headers.
+    """
+    if fmt == "binary":
+        headers = {
+            f"X-Series-{k.replace('_', '-').title()}": str(v) for k, v in meta.items()
+        }
+        return Response(
+            content=encode_series_binary(dates, values),
+            media_type="application/octet-stream",
+            headers=headers,
+        )
+    return {
+        **meta,
+        "dates": [d.isoformat() for d in dates],
+        "values": values,
+    }
+
+
+def downsample_indices(
+    x: np.ndarray, y: np.ndarray, points: int, method: str = "lttb"
+) -> np.ndarray:
+    """Indices of the points kept when reducing ``(x, y)`` to ``points``."""
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    if method == "lttb":
+        return _lttb_indices(x, y, points)
+    if method == "minmax":
+        return _minmax_indices(y, points)
+    raise ValueError(f"Unknown downsample method: {method}")
+
+
+# ------------------------------------------------------------------
+# Internal helpers
+# ------------------------------------------------------------------
+
+def _downsample_series(
+    dates: list[date], values: np.ndarray, points: int, method: str
+) -> tuple[list[date], list[float]]:
+    x = np.array([d.toordinal() for d in dates], dtype=float)
+    idx = downsample_indices(x, values, points, method)
+    return [dates[i] for i in idx], [round(float(values[i]), 2) for i in idx]
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets. Always keeps the first and last point."""
+    n = len(y)
+    if points < 3:
+        return np.array([0, n - 1][:points], dtype=np.int64)
+
+    # points - 2 buckets spread over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    idx = np.empty(points, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i == points - 3:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x = x[hi:edges[i + 2]].mean()
+            avg_y = y[hi:edges[i + 2]].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def _minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+    """Min and max of each of ``points // 2`` equal-width buckets."""
+    n = len(y)
+    n_buckets = max(points // 2, 1)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+
+    # Sort by value within each bucket: first is argmin, last is argmax
+    order = np.lexsort((y, bucket))
+    first = order[edges[:-1]]
+    last = order[edges[1:] - 1]
+    return np.unique(np.concatenate([first, last]))
+
+
+def _daily_portfolio_values(db: Session, portfolio_id: int) -> pd.Series:
+    txns = pd.DataFrame(
+        db.execute(
+            text(
+                """
+                SELECT ticker, operation, quantity, date
+                FROM transactions
+                WHERE portfolio_id = :pid
+                """
+            ),
+            {"pid": portfolio_id},
+        ).fetchall(),
+        columns=["ticker", "operation", "quantity", "date"],
+    )
+    if txns.empty:
+        return pd.Series(dtype=float)
+
+    prices = pd.DataFrame(
+        db.execute(
+            text(
+                """
+                SELECT ticker, date, close FROM market_prices
+                WHERE ticker IN (
+                    SELECT DISTINCT ticker FROM transactions WHERE portfolio_id = :pid
+                )
+                """
+            ),
+            {"pid": portfolio_id},
+        ).fetchall(),
+        columns=["ticker", "date", "close"],
+    )
+    if prices.empty:
+        return pd.Series(dtype=float)
+
+    closes = prices.pivot(index="date", columns="ticker", values="close").astype(float)
+
+    sign = np.where(txns["operation"].str.lower() == "buy", 1.0, -1.0)
+    txns["delta"] = txns["quantity"].astype(float) * sign
+    deltas = txns.pivot_table(
+        index="date", columns="ticker", values="delta", aggfunc="sum"
+    )
+
+    # Cumulative holdings evaluated on every price date
+    all_dates = closes.index.union(deltas.index)
+    held = deltas.reindex(index=all_dates, columns=closes.columns).fillna(0).cumsum()
+    held = held.reindex(closes.index)
+
+    values = (held * closes.ffill()).fillna(0).sum(axis=1).sort_index()
+
+    # market_prices is shared, so it can go back years before this
+    # portfolio existed; those dates would just be a flat zero line.
+    return values[values.index >= txns["date"].min()]
+
+
+def _ticker_version(db: Session, ticker: str) -> str:
+    # SUM(close) catches split rewrites that keep the row count and last date
+    last_date, count, total = db.execute(
+        text(
+            """
+            SELECT MAX(date), COUNT(*), SUM(close) FROM market_prices
+            WHERE ticker = :ticker
+            """
+        ),
+        {"ticker": ticker},
+    ).fetchone()
+    return f"{last_date}:{count}:{total}"
+
+
+def _cache_get(key: tuple, version: str) -> tuple[list[date], list[float]] | None:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        _cache.move_to_end(key)
+        return entry[1], entry[2]
+
+
+def _cache_put(
+    key: tuple, version: str, series: tuple[list[date], list[float]]
+) -> None:
+    with _lock:
+        _cache[key] = (version, series[0], series[1])
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHE_ENTRIES:
+            _cache.popitem(last=False)
@@ -11,16 +11,41 @@ Logic per ticker:
    If they differ → delete all stored prices for that ticker and
    re-insert the fresh (split-adjusted) data.
 4. Insert with ON CONFLICT DO NOTHING so re-runs are safe.
+
+Steps 2–4 run under a per-ticker Postgres advisory lock so that several
+API workers never download the same ticker at once, and one worker's
+split DELETE can't race another's inserts. A worker that finds the lock
+taken waits for it (up to ``_LOCK_WAIT_TIMEOUT``) and, if the other
+worker's rows already cover its holding ranges, reuses them instead of
+downloading again.
 """
 
+import hashlib
+import time
+from contextlib import contextmanager
 from datetime import date, timedelta
 from decimal import Decimal
+from typing import Iterator
 
 import pandas as pd
 import yfinance as yf
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+# First key of the two-int advisory lock, so ticker locks can't collide
+# with advisory locks taken for other purposes on the same database.
+_TICKER_LOCK_NAMESPACE = 7301
+
+# How long to wait for another worker's refresh of a ticker, and how
+# often to retry the lock meanwhile.
+_LOCK_WAIT_TIMEOUT = 60.0
+_LOCK_POLL_INTERVAL = 0.25
+
+# Longest run of calendar days without a stored price that still counts as
+# covered, at a range start or between rows (weekends and multi-day market
+# holidays have no rows).
+_COVERAGE_SLACK = timedelta(days=10)
+
 
 # ------------------------------------------------------------------
 # Public API
@@ -29,13 +54,16 @@ from sqlalchemy.orm import Session
 def backfill_portfolio_prices(db: Session, portfolio_id: int) -> dict:
     """Download & store missing market prices for every ticker in the portfolio.
 
-    Returns a short summary dict (ticker → number of rows written).
+    Returns a short summary dict (ticker → number of rows written). Tickers
+    whose download came back empty, or whose lock wait timed out, are listed
+    under ``failed`` so callers can avoid caching an incomplete result.
     """
     tickers = _distinct_tickers(db, portfolio_id)
     if not tickers:
         return {"tickers_processed": 0}
 
     summary: dict[str, int] = {}
+    failed: list[str] = []
 
     for ticker in tickers:
         hold_ranges = _holding_ranges(db, portfolio_id, ticker)
@@ -43,38 +71,177 @@ def backfill_portfolio_prices(db: Session, portfolio_id: int) -> dict:
             summary[ticker] = 0
             continue
 
-        # Merge ranges into one yfinance download window
-        dl_start = min(r[0] for r in hold_ranges)
-        dl_end = max(r[1] for r in hold_ranges)
+        try:
+            with _ticker_lock(db, ticker) as waited:
+                if waited and _prices_cover_ranges(db, ticker, hold_ranges):
+                    # Another worker just refreshed this ticker — reuse its rows
+                    summary[ticker] = 0
+                    continue
+                written = _refresh_ticker(db, ticker, hold_ranges)
+        except TimeoutError:
+            written = None
+
+        if written is None:
+            failed.append(ticker)
+            written = 0
+        summary[ticker] = written
 
-        prices = _download_prices(ticker, dl_start, dl_end)
-        if prices.empty:
-            summary[ticker] = 0
-            continue
+    return {"tickers_processed": len(tickers), "details": summary, "failed": failed}
 
-        # Keep only dates that fall inside a holding range
-        prices = _filter_to_ranges(prices, hold_ranges)
-        if prices.empty:
-            summary[ticker] = 0
-            continue
 
-        # Split detection
-        _handle_split_detection(db, ticker, prices)
+def portfolio_version(db: Session, portfolio_id: int) -> str:
+    """Return a cheap version key for the portfolio's analysis inputs.
 
-        # Upsert rows
-        written = _upsert_prices(db, ticker, prices)
-        summary[ticker] = written
+    Combines a digest of the portfolio's transactions with the latest stored
+    ``market_prices`` date, row count and sum of closes for its tickers (the
+    sum changes when a split rewrites prices in place), plus today's date
+    since holding ranges always extend to yesterday.
+    """
+    row = db.execute(
+        text(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM transactions WHERE portfolio_id = :pid),
+                (SELECT md5(string_agg(
+                     id::text || ':' || ticker || ':' || operation || ':'
+                     || quantity::text || ':' || date::text,
+                     ',' ORDER BY id))
+                 FROM transactions WHERE portfolio_id = :pid),
+                MAX(mp.date),
+                COUNT(mp.date),
+                SUM(mp.close)
+            FROM market_prices mp
+            WHERE mp.ticker IN (
+                SELECT DISTINCT ticker FROM transactions WHERE portfolio_id = :pid
+            )
+            """
+        ),
+        {"pid": portfolio_id},
+    ).fetchone()
 
-    return {"tickers_processed": len(tickers), "details": summary}
+    txn_count, txn_digest, last_price_date, price_count, price_sum = row
+    raw = (
+        f"{txn_count}:{txn_digest}:{last_price_date}:{price_count}:{price_sum}:"
+        f"{date.today()}"
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
 
 
 # ------------------------------------------------------------------
 # Internal helpers
 # ------------------------------------------------------------------
 
+@contextmanager
+def _ticker_lock(db: Session, ticker: str) -> Iterator[bool]:
+    """Hold a cross-worker advisory lock for ``ticker``.
+
+    Uses a dedicated connection because the session commits (and so may
+    hand back its connection) mid-refresh, while session-level advisory
+    locks belong to the connection that took them. The connection runs in
+    autocommit so it never sits "idle in transaction" during the download.
+
+    Yields ``True`` if the lock was busy and we had to wait for another
+    worker to release it. Raises ``TimeoutError`` if it stays busy for
+    longer than ``_LOCK_WAIT_TIMEOUT`` seconds.
+    """
+    params = {"ns": _TICKER_LOCK_NAMESPACE, "ticker": ticker}
+    engine = db.get_bind().execution_options(isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        deadline = time.monotonic() + _LOCK_WAIT_TIMEOUT
+        waited = False
+        while not conn.execute(
+            text("SELECT pg_try_advisory_lock(:ns, hashtext(:ticker))"), params
+        ).scalar():
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Timed out waiting for price refresh of {ticker}"
+                )
+            waited = True
+            time.sleep(_LOCK_POLL_INTERVAL)
+        try:
+            yield waited
+        finally:
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:ns, hashtext(:ticker))"), params
+            )
+
+
+def _refresh_ticker(
+    db: Session, ticker: str, hold_ranges: list[tuple[date, date]]
+) -> int | None:
+    """Download, split-check and upsert prices for one ticker.
+
+    Must be called while holding :func:`_ticker_lock`. Returns rows written,
+    or ``None`` if the provider returned nothing for the holding window.
+    """
+    # Merge ranges into one yfinance download window
+    dl_start = min(r[0] for r in hold_ranges)
+    dl_end = max(r[1] for r in hold_ranges)
+
+    prices = _download_prices(ticker, dl_start, dl_end)
+    if prices.empty:
+        return None
+
+    # Keep only dates that fall inside a holding range
+    prices = _filter_to_ranges(prices, hold_ranges)
+    if prices.empty:
+        return 0
+
+    # Split detection
+    _handle_split_detection(db, ticker, prices)
+
+    # Upsert rows
+    return _upsert_prices(db, ticker, prices)
+
+
+def _prices_cover_ranges(
+    db: Session, ticker: str, ranges: list[tuple[date, date]]
+) -> bool:
+    """True if stored prices cover every holding range.
+
+    The first stored row may lag the range start, and consecutive rows may
+    be apart, by at most ``_COVERAGE_SLACK`` — a longer hole means the other
+    worker held the ticker over different ranges. The last row must reach
+    the final weekday of the range; a stale tail means the other worker's
+    download failed. Either way we should download for ourselves.
+    """
+    for rng_start, rng_end in ranges:
+        stored = [
+            r[0]
+            for r in db.execute(
+                text(
+                    """
+                    SELECT date FROM market_prices
+                    WHERE ticker = :ticker AND date BETWEEN :start AND :end
+                    ORDER BY date
+                    """
+                ),
+                {"ticker": ticker, "start": rng_start, "end": rng_end},
+            ).fetchall()
+        ]
+        if not stored or stored[-1] < _last_weekday(rng_end):
+            return False
+        for prev, cur in zip([rng_start] + stored, stored):
+            if cur - prev > _COVERAGE_SLACK:
+                return False
+    return True
+
+
+def _last_weekday(day: date) -> date:
+    """``day`` itself, or the Friday before it if it falls on a weekend."""
+    return day - timedelta(days=max(day.weekday() - 4, 0))
+
+
 def _distinct_tickers(db: Session, portfolio_id: int) -> list[str]:
+    # Sorted so concurrent workers take ticker locks in the same order
     rows = db.execute(
-        text("SELECT DISTINCT ticker FROM transactions WHERE portfolio_id = :pid"),
+        text(
+            """
+            SELECT DISTINCT ticker FROM transactions
+            WHERE portfolio_id = :pid
+            ORDER BY ticker
+            """
+        ),
         {"pid": portfolio_id},
     ).fetchall()
     return [r[0] for r in rows]
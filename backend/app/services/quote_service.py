@@ -0,0 +1,301 @@
+"""
+Live quotes for currently held tickers.
+
+One :class:`LiveQuoteHub` runs per API process. Its background task
+periodically asks the quote source for the union of tickers that anyone
+currently holds (a single batched provider call), keeps the latest quote
+per ticker in memory, and pushes only the tickers whose price changed to
+subscribers interested in them. Provider traffic therefore scales with the
+number of distinct held tickers, not with the number of connected clients.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Protocol
+
+import pandas as pd
+import yfinance as yf
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.schemas.quotes import Quote
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------
+# Quote sources
+# ------------------------------------------------------------------
+
+class QuoteSource(Protocol):
+    def fetch(self, tickers: list[str]) -> dict[str, float]:
+        """Return the latest price for each ticker it could resolve."""
+        ...
+
+
+class YFinanceQuoteSource:
+    """Latest intraday prices from yfinance, one batched download per poll."""
+
+    def fetch(self, tickers: list[str]) -> dict[str, float]:
+        if not tickers:
+            return {}
+        try:
+            df = yf.download(
+                tickers, period="1d", interval="1m", progress=False, group_by="column"
+            )
+        except Exception:
+            return {}
+
+        if df.empty:
+            return {}
+
+        close = df["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+
+        last = close.ffill().iloc[-1]
+        return {
+            t: round(float(last[t]), 2)
+            for t in tickers
+            if t in last.index and pd.notna(last[t])
+        }
+
+
+class FakeQuoteSource:
+    """In-memory quote source for tests.
+
+    Prices are whatever was last passed to :meth:`set_price`; ``calls``
+    records every batch of tickers requested so tests can assert on
+    provider traffic.
+    """
+
+    def __init__(self, prices: dict[str, float] | None = None):
+        self.prices: dict[str, float] = dict(prices or {})
+        self.calls: list[list[str]] = []
+
+    def set_price(self, ticker: str, price: float) -> None:
+        self.prices[ticker] = price
+
+    def fetch(self, tickers: list[str]) -> dict[str, float]:
+        self.calls.append(list(tickers))
+        return {t: self.prices[t] for t in tickers if t in self.prices}
+
+
+# ------------------------------------------------------------------
+# Held tickers
+# ------------------------------------------------------------------
+
+def held_positions(
+    db: Session,
+    user_id: str | None = None,
+    portfolio_id: int | None = None,
+) -> list[tuple[str, int, str]]:
+    """``(user_id, portfolio_id, ticker)`` for every positive net holding.
+
+    Optionally restricted to one user's portfolios and/or a single portfolio.
+    """
+    rows = db.execute(
+        text(
+            """
+            SELECT p.user_id::text, t.portfolio_id, t.ticker
+            FROM transactions t
+            JOIN portfolios p ON p.id = t.portfolio_id
+            WHERE (CAST(:uid AS text) IS NULL OR p.user_id::text = :uid)
+              AND (CAST(:pid AS bigint) IS NULL OR p.id = :pid)
+            GROUP BY p.user_id, t.portfolio_id, t.ticker
+            HAVING SUM(CASE WHEN lower(t.operation) = 'buy'
+                            THEN t.quantity ELSE -t.quantity END) > 0
+            ORDER BY t.ticker
+            """
+        ),
+        {"uid": user_id, "pid": portfolio_id},
+    ).fetchall()
+    return [(r[0], r[1], r[2]) for r in rows]
+
+
+def held_tickers(
+    db: Session,
+    user_id: str | None = None,
+    portfolio_id: int | None = None,
+) -> list[str]:
+    """Distinct tickers held, with the same filters as :func:`held_positions`."""
+    return sorted({t for _, _, t in held_positions(db, user_id, portfolio_id)})
+
+
+def _all_held_positions() -> list[tuple[str, int, str]]:
+    db = SessionLocal()
+    try:
+        return held_positions(db)
+    finally:
+        db.close()
+
+
+# ------------------------------------------------------------------
+# Hub
+# ------------------------------------------------------------------
+
+class Subscription:
+    """A client's interest in a set of tickers.
+
+    Subscriptions made for a ``user_id`` have their tickers re-resolved by
+    the hub on every poll, so positions opened after connecting start
+    streaming too. Updates published while the client is busy are coalesced
+    per ticker, so a slow client only ever receives the latest quote, never
+    a backlog.
+    """
+
+    def __init__(
+        self,
+        tickers: set[str],
+        user_id: str | None = None,
+        portfolio_id: int | None = None,
+    ):
+        self.tickers = tickers
+        self.user_id = user_id
+        self.portfolio_id = portfolio_id
+        self._pending: dict[str, Quote] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, quotes: list[Quote]) -> None:
+        for quote in quotes:
+            if quote.ticker in self.tickers:
+                self._pending[quote.ticker] = quote
+        if self._pending:
+            self._ready.set()
+
+    async def next_batch(self) -> list[Quote]:
+        """Wait for and return the quotes changed since the last batch."""
+        await self._ready.wait()
+        self._ready.clear()
+        batch, self._pending = list(self._pending.values()), {}
+        return batch
+
+
+class LiveQuoteHub:
+    """Per-process poller and fan-out for live quotes.
+
+    Polling is skipped entirely while nobody is subscribed; the first
+    subscriber wakes the poller immediately.
+    """
+
+    def __init__(self, source: QuoteSource, interval_seconds: float = 15.0):
+        self.source = source
+        self.interval_seconds = interval_seconds
+        self._snapshot: dict[str, Quote] = {}
+        self._subscriptions: set[Subscription] = set()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    # -- subscribers -------------------------------------------------
+
+    def snapshot(self, tickers: set[str] | None = None) -> list[Quote]:
+        """Latest known quotes, optionally limited to ``tickers``."""
+        return [
+            q for t, q in self._snapshot.items() if tickers is None or t in tickers
+        ]
+
+    def subscribe(
+        self,
+        tickers: set[str],
+        user_id: str | None = None,
+        portfolio_id: int | None = None,
+    ) -> Subscription:
+        if not self._subscriptions:
+            self._wake.set()
+        subscription = Subscription(tickers, user_id, portfolio_id)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def update_subscriptions(self, positions: list[tuple[str, int, str]]) -> None:
+        """Re-resolve each user subscription's tickers from current positions.
+
+        Newly added tickers get their current snapshot quote pushed so the
+        client doesn't wait for the next price change.
+        """
+        by_user: dict[str, list[tuple[int, str]]] = {}
+        for user_id, portfolio_id, ticker in positions:
+            by_user.setdefault(user_id, []).append((portfolio_id, ticker))
+
+        for subscription in self._subscriptions:
+            if subscription.user_id is None:
+                continue
+            wanted_pid = subscription.portfolio_id
+            tickers = {
+                t
+                for pid, t in by_user.get(subscription.user_id, [])
+                if wanted_pid is None or pid == wanted_pid
+            }
+            added = tickers - subscription.tickers
+            subscription.tickers = tickers
+            if added:
+                subscription.push(self.snapshot(added))
+
+    # -- polling -----------------------------------------------------
+
+    async def poll_once(self, tickers: list[str]) -> list[Quote]:
+        """Fetch ``tickers`` once, update the snapshot and push changes.
+
+        Returns the quotes whose price changed.
+        """
+        prices = await asyncio.to_thread(self.source.fetch, tickers) if tickers else {}
+        now = datetime.now(timezone.utc)
+
+        changed: list[Quote] = []
+        for ticker, price in prices.items():
+            previous = self._snapshot.get(ticker)
+            if previous is not None and previous.price == price:
+                continue
+            quote = Quote(ticker=ticker, price=price, as_of=now)
+            self._snapshot[ticker] = quote
+            changed.append(quote)
+
+        # Forget tickers nobody holds any more
+        for ticker in set(self._snapshot) - set(tickers):
+            del self._snapshot[ticker]
+
+        if changed:
+            for subscription in self._subscriptions:
+                subscription.push(changed)
+        return changed
+
+    async def run(self) -> None:
+        while True:
+            if self._subscriptions:
+                try:
+                    positions = await asyncio.to_thread(_all_held_positions)
+                    self.update_subscriptions(positions)
+                    await self.poll_once(sorted({t for _, _, t in positions}))
+                except Exception:
+                    logger.exception("Live quote poll failed")
+            else:
+                # Nobody is listening: don't keep serving stale prices later
+                self._snapshot.clear()
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    @property
+    def running(self) -> bool:
+        """Whether the background poller is active."""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
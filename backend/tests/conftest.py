@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+# Settings are read when ``app.db`` is imported. Only Postgres-backed tests
+# need a real database; the rest just need the settings to validate.
+_REAL_DATABASE_URL = os.environ.get("DATABASE_URL")
+
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/unused")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+
+
+@pytest.fixture
+def database_url() -> str:
+    """URL of a disposable local Postgres; skips the test if none is set."""
+    if not _REAL_DATABASE_URL:
+        pytest.skip("DATABASE_URL not set")
+    return _REAL_DATABASE_URL
@@ -0,0 +1,41 @@
+import pytest
+
+from app.services import analysis_cache
+from app.services.analysis_cache import get_cached_analysis, store_analysis
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    analysis_cache._cache.clear()
+    yield
+    analysis_cache._cache.clear()
+
+
+def test_hit_and_miss_by_version():
+    store_analysis(1, "v1", {"portfolio_id": 1})
+
+    assert get_cached_analysis(1, "v1") == {"portfolio_id": 1}
+    assert get_cached_analysis(1, "v2") is None
+    assert get_cached_analysis(2, "v1") is None
+
+
+def test_new_version_drops_older_versions_of_same_portfolio():
+    store_analysis(1, "v1", {"n": 1})
+    store_analysis(2, "v1", {"n": 2})
+    store_analysis(1, "v2", {"n": 3})
+
+    assert get_cached_analysis(1, "v1") is None
+    assert get_cached_analysis(1, "v2") == {"n": 3}
+    assert get_cached_analysis(2, "v1") == {"n": 2}
+
+
+def test_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(analysis_cache, "MAX_ENTRIES", 2)
+    store_analysis(1, "v", {"n": 1})
+    store_analysis(2, "v", {"n": 2})
+    get_cached_analysis(1, "v")  # 1 is now more recent than 2
+    store_analysis(3, "v", {"n": 3})
+
+    assert get_cached_analysis(2, "v") is None
+    assert get_cached_analysis(1, "v") == {"n": 1}
+    assert get_cached_analysis(3, "v") == {"n": 3}
@@ -0,0 +1,119 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_current_user
+from app.api.routes import portfolio
+from app.api.routes.portfolio import _etag_matches
+from app.db import get_db
+from app.services import analysis_cache
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", W/"abc"', True),
+        ("*", True),
+        ('"other"', False),
+        ("abc", False),
+    ],
+)
+def test_etag_matches(header, expected):
+    assert _etag_matches(header, 'W/"abc"') is expected
+
+
+class _User:
+    id = "9d81edfe-1774-4ade-981f-5467cc306e31"
+
+
+@pytest.fixture
+def analyze(monkeypatch):
+    """Client for the analyze route with the DB-touching helpers stubbed.
+
+    ``state["versions"]`` is consumed one version per ``portfolio_version``
+    call (the last one repeats); ``state["failed"]`` is what the backfill
+    reports as failed.
+    """
+    state = {"versions": ["v1"], "failed": [], "backfills": 0}
+
+    def fake_version(db, portfolio_id):
+        versions = state["versions"]
+        return versions.pop(0) if len(versions) > 1 else versions[0]
+
+    def fake_backfill(db, portfolio_id):
+        state["backfills"] += 1
+        return {
+            "tickers_processed": 1,
+            "details": {"AAA.IS": 5},
+            "failed": list(state["failed"]),
+        }
+
+    monkeypatch.setattr(portfolio, "portfolio_version", fake_version)
+    monkeypatch.setattr(portfolio, "backfill_portfolio_prices", fake_backfill)
+    monkeypatch.setattr(portfolio, "_ensure_owned", lambda db, pid, uid: None)
+    analysis_cache._cache.clear()
+
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    app.dependency_overrides[get_current_user] = lambda: _User()
+    app.dependency_overrides[get_db] = lambda: None
+
+    yield TestClient(app), state
+    analysis_cache._cache.clear()
+
+
+def test_fresh_then_cached_then_not_modified(analyze):
+    client, state = analyze
+    # Pre-backfill version differs from the post-backfill one
+    state["versions"] = ["v0", "v1"]
+
+    first = client.get("/portfolios/7/analyze")
+    assert first.status_code == 200
+    assert first.headers["etag"] == 'W/"v1"'
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert first.json()["cached"] is False
+    assert first.json()["backfill"]["details"] == {"AAA.IS": 5}
+
+    second = client.get("/portfolios/7/analyze")
+    assert second.status_code == 200
+    assert second.headers["etag"] == 'W/"v1"'
+    assert second.json()["cached"] is True
+
+    third = client.get(
+        "/portfolios/7/analyze", headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert third.status_code == 304
+    assert third.headers["etag"] == 'W/"v1"'
+
+    assert state["backfills"] == 1
+
+
+def test_changed_version_reruns_backfill(analyze):
+    client, state = analyze
+    etag = client.get("/portfolios/7/analyze").headers["etag"]
+
+    state["versions"] = ["v2"]
+    response = client.get("/portfolios/7/analyze", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == 'W/"v2"'
+    assert response.json()["cached"] is False
+    assert state["backfills"] == 2
+
+
+def test_failed_backfill_is_not_cached(analyze):
+    client, state = analyze
+    state["failed"] = ["AAA.IS"]
+
+    first = client.get("/portfolios/7/analyze")
+    assert first.status_code == 200
+    assert "etag" not in first.headers
+    assert first.headers["cache-control"] == "no-store"
+
+    second = client.get("/portfolios/7/analyze")
+    assert second.json()["cached"] is False
+    assert state["backfills"] == 2
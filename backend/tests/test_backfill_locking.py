@@ -0,0 +1,223 @@
+"""
+Several processes backfilling portfolios that share tickers must download
+each ticker exactly once: the first takes the advisory lock and downloads,
+the rest wait and reuse its rows — unless those rows don't cover their own
+holding ranges.
+"""
+
+import multiprocessing as mp
+import queue
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, make_url, text
+
+N_WORKERS = 4
+TICKERS = ["AAA.IS", "BBB.IS"]
+DOWNLOAD_SECONDS = 1.0
+JOIN_TIMEOUT = 60
+
+
+def _fake_download(ticker: str, start: date, end: date) -> pd.DataFrame:
+    days = pd.bdate_range(start, end)
+    return pd.DataFrame({"date": [d.date() for d in days], "close": 10.0})
+
+
+def _worker(
+    url: str, portfolio_id: int, calls, barrier=None, ready=None, hold=None
+) -> None:
+    """Backfill one portfolio with a counting fake download.
+
+    ``barrier`` lines workers up before they start; ``ready`` is set just
+    before this worker backfills; ``hold`` keeps its download (and so the
+    ticker lock) open until the test releases it.
+    """
+    from sqlalchemy.orm import sessionmaker
+    from app.services import portfolio_service
+
+    def counting_download(ticker, start, end):
+        calls.put(ticker)
+        if hold is not None:
+            hold.wait(JOIN_TIMEOUT)
+        else:
+            time.sleep(DOWNLOAD_SECONDS)  # keep the lock long enough to contend
+        return _fake_download(ticker, start, end)
+
+    portfolio_service._download_prices = counting_download
+
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    if barrier is not None:
+        barrier.wait()
+    if ready is not None:
+        ready.set()
+    try:
+        result = portfolio_service.backfill_portfolio_prices(session, portfolio_id)
+        assert result["failed"] == []
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _join_all(procs) -> None:
+    """Join workers, killing any that hang so they can't keep holding locks."""
+    deadline = time.monotonic() + JOIN_TIMEOUT
+    for p in procs:
+        p.join(timeout=max(deadline - time.monotonic(), 0))
+    hung = [p for p in procs if p.is_alive()]
+    for p in hung:
+        p.terminate()
+        p.join()
+    assert not hung, f"{len(hung)} worker(s) hung"
+    assert all(p.exitcode == 0 for p in procs)
+
+
+def _drain(calls) -> Counter:
+    downloaded = Counter()
+    while True:
+        try:
+            downloaded[calls.get(timeout=1)] += 1
+        except queue.Empty:
+            return downloaded
+
+
+def _add_portfolio(conn, name: str, txns: list[tuple[str, str, date]]) -> int:
+    pid = conn.execute(
+        text("INSERT INTO portfolios (user_id, name) VALUES (:u, :n) RETURNING id"),
+        {"u": f"user-{name}", "n": name},
+    ).scalar()
+    for ticker, operation, txn_date in txns:
+        conn.execute(
+            text(
+                """
+                INSERT INTO transactions (portfolio_id, ticker,
+                    operation, market, quantity, price, date)
+                VALUES (:pid, :ticker, :op, 'BIST', 10, 10, :date)
+                """
+            ),
+            {"pid": pid, "ticker": ticker, "op": operation, "date": txn_date},
+        )
+    return pid
+
+
+@pytest.fixture
+def schema_url(database_url):
+    """Fresh schema with the tables the backfill touches; dropped afterwards."""
+    schema = f"test_backfill_{uuid.uuid4().hex[:8]}"
+    url = make_url(database_url).update_query_dict(
+        {"options": f"-csearch_path={schema}"}
+    )
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+        conn.execute(
+            text(
+                """
+                CREATE TABLE portfolios (
+                    id serial PRIMARY KEY, user_id text, name text
+                );
+                CREATE TABLE transactions (
+                    id serial PRIMARY KEY,
+                    portfolio_id int REFERENCES portfolios(id),
+                    ticker text, operation text, market text,
+                    quantity numeric, price numeric, date date
+                );
+                CREATE TABLE market_prices (
+                    ticker text, date date, close numeric,
+                    PRIMARY KEY (ticker, date)
+                );
+                """
+            )
+        )
+    try:
+        yield url.render_as_string(hide_password=False), engine
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        engine.dispose()
+
+
+def test_concurrent_backfills_download_each_ticker_once(schema_url):
+    url, engine = schema_url
+    bought = date.today() - timedelta(days=60)
+
+    with engine.begin() as conn:
+        portfolio_ids = [
+            _add_portfolio(conn, f"p{i}", [(t, "buy", bought) for t in TICKERS])
+            for i in range(N_WORKERS)
+        ]
+
+    ctx = mp.get_context("spawn")
+    calls = ctx.Queue()
+    barrier = ctx.Barrier(N_WORKERS)
+    procs = [
+        ctx.Process(target=_worker, args=(url, pid, calls, barrier))
+        for pid in portfolio_ids
+    ]
+    for p in procs:
+        p.start()
+    _join_all(procs)
+
+    assert _drain(calls) == {ticker: 1 for ticker in TICKERS}
+
+    with engine.connect() as conn:
+        stored = conn.execute(
+            text("SELECT ticker, COUNT(*) FROM market_prices GROUP BY ticker")
+        ).fetchall()
+    expected = len(pd.bdate_range(bought, date.today() - timedelta(days=1)))
+    assert dict(stored) == {ticker: expected for ticker in TICKERS}
+
+
+def test_waiter_downloads_when_other_ranges_leave_a_gap(schema_url):
+    url, engine = schema_url
+    today = date.today()
+    start = today - timedelta(days=240)
+    ticker = TICKERS[0]
+
+    with engine.begin() as conn:
+        # Holds the ticker twice, with a two-month hole in between
+        split_pid = _add_portfolio(
+            conn,
+            "split",
+            [
+                (ticker, "buy", start),
+                (ticker, "sell", today - timedelta(days=180)),
+                (ticker, "buy", today - timedelta(days=120)),
+            ],
+        )
+        # Holds it continuously over the same span
+        whole_pid = _add_portfolio(conn, "whole", [(ticker, "buy", start)])
+
+    ctx = mp.get_context("spawn")
+    calls = ctx.Queue()
+    ready, hold = ctx.Event(), ctx.Event()
+    first = ctx.Process(
+        target=_worker, args=(url, split_pid, calls), kwargs={"hold": hold}
+    )
+    first.start()
+    # The first worker is now downloading, holding the ticker lock
+    assert calls.get(timeout=JOIN_TIMEOUT) == ticker
+    second = ctx.Process(
+        target=_worker, args=(url, whole_pid, calls), kwargs={"ready": ready}
+    )
+    second.start()
+    # Let the second worker start polling the lock before releasing it
+    assert ready.wait(JOIN_TIMEOUT)
+    time.sleep(DOWNLOAD_SECONDS)
+    hold.set()
+    _join_all([first, second])
+
+    downloaded = _drain(calls)
+    downloaded[ticker] += 1  # the call consumed above
+    assert downloaded == {ticker: 2}
+
+    with engine.connect() as conn:
+        stored = conn.execute(
+            text("SELECT COUNT(*) FROM market_prices WHERE ticker = :t"),
+            {"t": ticker},
+        ).scalar()
+    assert stored == len(pd.bdate_range(start, today - timedelta(days=1)))
@@ -0,0 +1,241 @@
+import struct
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.services import history_service
+from app.services.history_service import (
+    _daily_portfolio_values,
+    _lttb_indices,
+    _minmax_indices,
+    downsample_indices,
+    encode_series_binary,
+    price_history,
+)
+
+
+def _series(n: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float)
+    y = np.cumsum(rng.normal(size=n)) + 100
+    return x, y
+
+
+@pytest.mark.parametrize("n, points", [(10, 3), (100, 7), (1000, 50), (2520, 500)])
+def test_lttb_keeps_endpoints_and_count(n, points):
+    x, y = _series(n)
+    idx = _lttb_indices(x, y, points)
+
+    assert len(idx) == points
+    assert idx[0] == 0
+    assert idx[-1] == n - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(200, dtype=float)
+    y = np.zeros(200)
+    y[123] = 50.0
+
+    assert 123 in _lttb_indices(x, y, 10)
+
+
+@pytest.mark.parametrize("n, points", [(10, 4), (101, 10), (2520, 500)])
+def test_minmax_keeps_bucket_extremes(n, points):
+    _, y = _series(n, seed=1)
+    idx = _minmax_indices(y, points)
+
+    assert len(idx) <= points
+    assert np.all(np.diff(idx) > 0)
+    assert int(np.argmin(y)) in idx
+    assert int(np.argmax(y)) in idx
+
+    edges = np.linspace(0, n, points // 2 + 1).astype(int)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        assert lo + int(np.argmin(y[lo:hi])) in idx
+        assert lo + int(np.argmax(y[lo:hi])) in idx
+
+
+def test_downsample_is_identity_when_series_is_short():
+    x, y = _series(20)
+    for method in ("lttb", "minmax"):
+        assert list(downsample_indices(x, y, 20, method)) == list(range(20))
+
+
+def test_binary_layout():
+    dates = [date(1970, 1, 1) + timedelta(days=d) for d in (19000, 19001, 19004)]
+    values = [1234567.89, 1234567.9, 99999999.99]
+
+    blob = encode_series_binary(dates, values)
+
+    count, padding = struct.unpack_from("<II", blob, 0)
+    assert (count, padding) == (3, 0)
+    assert len(blob) == 8 + 8 * count + 4 * count
+    assert list(np.frombuffer(blob, dtype="<f8", count=count, offset=8)) == values
+    assert list(
+        np.frombuffer(blob, dtype="<i4", count=count, offset=8 + 8 * count)
+    ) == [19000, 19001, 19004]
+
+
+# ------------------------------------------------------------------
+# Valuation and caching against a stub session
+# ------------------------------------------------------------------
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class _StubSession:
+    """Answers the history queries from fixed rows and counts price reads."""
+
+    def __init__(self, transactions=(), prices=()):
+        self.transactions = list(transactions)
+        self.prices = list(prices)
+        self.price_reads = 0
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        if "SUM(close)" in sql:
+            rows = [r for r in self.prices if r[0] == params["ticker"]]
+            return _Result(
+                [(
+                    max((r[1] for r in rows), default=None),
+                    len(rows),
+                    sum((r[2] for r in rows), Decimal(0)),
+                )]
+            )
+        if "FROM market_prices" in sql:
+            self.price_reads += 1
+            if "SELECT date, close" in sql:
+                return _Result(
+                    [(d, c) for t, d, c in sorted(self.prices, key=lambda r: r[1])
+                     if t == params["ticker"]]
+                )
+            return _Result(self.prices)
+        return _Result(self.transactions)
+
+
+D = date  # short alias for the fixtures below
+
+
+def _values(db) -> dict[date, float]:
+    return {d: round(v, 2) for d, v in _daily_portfolio_values(db, 1).items()}
+
+
+def test_valuation_starts_at_first_transaction():
+    db = _StubSession(
+        transactions=[("AAA.IS", "buy", Decimal("10"), D(2024, 1, 8))],
+        prices=[
+            ("AAA.IS", D(2015, 1, 5), Decimal("1.00")),  # held by someone else
+            ("AAA.IS", D(2024, 1, 5), Decimal("9.00")),
+            ("AAA.IS", D(2024, 1, 8), Decimal("10.00")),
+            ("AAA.IS", D(2024, 1, 9), Decimal("11.00")),
+        ],
+    )
+
+    assert _values(db) == {D(2024, 1, 8): 100.0, D(2024, 1, 9): 110.0}
+
+
+def test_weekend_transactions_apply_from_next_trading_day():
+    db = _StubSession(
+        transactions=[
+            ("AAA.IS", "buy", Decimal("10"), D(2024, 1, 6)),  # Saturday
+            ("AAA.IS", "sell", Decimal("4"), D(2024, 1, 14)),  # Sunday
+        ],
+        prices=[
+            ("AAA.IS", D(2024, 1, 8), Decimal("10.00")),
+            ("AAA.IS", D(2024, 1, 12), Decimal("10.00")),
+            ("AAA.IS", D(2024, 1, 15), Decimal("10.00")),
+        ],
+    )
+
+    assert _values(db) == {
+        D(2024, 1, 8): 100.0,
+        D(2024, 1, 12): 100.0,
+        D(2024, 1, 15): 60.0,
+    }
+
+
+def test_missing_close_is_carried_forward():
+    db = _StubSession(
+        transactions=[
+            ("AAA.IS", "buy", Decimal("1"), D(2024, 1, 8)),
+            ("BBB.IS", "buy", Decimal("2"), D(2024, 1, 8)),
+        ],
+        prices=[
+            ("AAA.IS", D(2024, 1, 8), Decimal("10.00")),
+            ("AAA.IS", D(2024, 1, 9), Decimal("12.00")),
+            ("BBB.IS", D(2024, 1, 8), Decimal("5.00")),
+            # no BBB row on the 9th
+        ],
+    )
+
+    assert _values(db) == {D(2024, 1, 8): 20.0, D(2024, 1, 9): 22.0}
+
+
+def test_ticker_without_prices_contributes_nothing():
+    db = _StubSession(
+        transactions=[
+            ("AAA.IS", "buy", Decimal("1"), D(2024, 1, 8)),
+            ("NEW.IS", "buy", Decimal("100"), D(2024, 1, 8)),
+        ],
+        prices=[("AAA.IS", D(2024, 1, 8), Decimal("10.00"))],
+    )
+
+    assert _values(db) == {D(2024, 1, 8): 10.0}
+
+
+def test_no_prices_gives_empty_series():
+    db = _StubSession(transactions=[("AAA.IS", "buy", Decimal("1"), D(2024, 1, 8))])
+
+    assert _daily_portfolio_values(db, 1).empty
+
+
+@pytest.fixture
+def empty_cache():
+    history_service._cache.clear()
+    yield
+    history_service._cache.clear()
+
+
+def test_cache_get_checks_version(empty_cache):
+    history_service._cache_put(("k",), "v1", ([D(2024, 1, 8)], [1.0]))
+
+    assert history_service._cache_get(("k",), "v1") == ([D(2024, 1, 8)], [1.0])
+    assert history_service._cache_get(("k",), "v2") is None
+    assert history_service._cache_get(("other",), "v1") is None
+
+
+def test_cache_evicts_least_recently_used(empty_cache, monkeypatch):
+    monkeypatch.setattr(history_service, "MAX_CACHE_ENTRIES", 2)
+    for key in ("a", "b"):
+        history_service._cache_put((key,), "v", ([], []))
+    history_service._cache_get(("a",), "v")
+    history_service._cache_put(("c",), "v", ([], []))
+
+    assert history_service._cache_get(("b",), "v") is None
+    assert history_service._cache_get(("a",), "v") is not None
+
+
+def test_price_history_recomputes_after_split_rewrite(empty_cache):
+    days = [D(2024, 1, d) for d in (8, 9, 10)]
+    db = _StubSession(prices=[("AAA.IS", d, Decimal("100.00")) for d in days])
+
+    first = price_history(db, "AAA.IS", None, None, 500)
+    again = price_history(db, "AAA.IS", None, None, 500)
+    assert first == again == (days, [100.0, 100.0, 100.0])
+    assert db.price_reads == 1
+
+    # A 2:1 split rewrite keeps the same dates and row count
+    db.prices = [("AAA.IS", d, Decimal("50.00")) for d in days]
+    assert price_history(db, "AAA.IS", None, None, 500) == (days, [50.0] * 3)
+    assert db.price_reads == 2
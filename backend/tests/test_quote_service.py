@@ -0,0 +1,116 @@
+import asyncio
+
+from app.services import quote_service
+from app.services.quote_service import FakeQuoteSource, LiveQuoteHub
+
+
+def test_one_fetch_per_poll_regardless_of_subscribers():
+    source = FakeQuoteSource({"AAA.IS": 10.0, "BBB.IS": 20.0})
+    hub = LiveQuoteHub(source)
+    for _ in range(25):
+        hub.subscribe({"AAA.IS", "BBB.IS"})
+
+    asyncio.run(hub.poll_once(["AAA.IS", "BBB.IS"]))
+    asyncio.run(hub.poll_once(["AAA.IS", "BBB.IS"]))
+
+    assert source.calls == [["AAA.IS", "BBB.IS"], ["AAA.IS", "BBB.IS"]]
+
+
+def test_poll_pushes_only_changed_tickers():
+    async def scenario():
+        source = FakeQuoteSource({"AAA.IS": 10.0, "BBB.IS": 20.0})
+        hub = LiveQuoteHub(source)
+        subscription = hub.subscribe({"AAA.IS", "BBB.IS"})
+
+        first = await hub.poll_once(["AAA.IS", "BBB.IS"])
+        initial = await subscription.next_batch()
+
+        source.set_price("AAA.IS", 10.5)
+        second = await hub.poll_once(["AAA.IS", "BBB.IS"])
+        update = await subscription.next_batch()
+        return first, initial, second, update
+
+    first, initial, second, update = asyncio.run(scenario())
+
+    assert {q.ticker for q in first} == {"AAA.IS", "BBB.IS"}
+    assert {q.ticker for q in initial} == {"AAA.IS", "BBB.IS"}
+    assert [(q.ticker, q.price) for q in second] == [("AAA.IS", 10.5)]
+    assert [(q.ticker, q.price) for q in update] == [("AAA.IS", 10.5)]
+
+
+def test_subscription_only_receives_its_tickers():
+    async def scenario():
+        hub = LiveQuoteHub(FakeQuoteSource({"AAA.IS": 10.0, "BBB.IS": 20.0}))
+        subscription = hub.subscribe({"BBB.IS"})
+        await hub.poll_once(["AAA.IS", "BBB.IS"])
+        return await subscription.next_batch()
+
+    assert [q.ticker for q in asyncio.run(scenario())] == ["BBB.IS"]
+
+
+def test_slow_subscriber_gets_latest_quote_per_ticker():
+    async def scenario():
+        source = FakeQuoteSource({"AAA.IS": 10.0, "BBB.IS": 20.0})
+        hub = LiveQuoteHub(source)
+        subscription = hub.subscribe({"AAA.IS", "BBB.IS"})
+
+        # Three polls before the client reads anything
+        await hub.poll_once(["AAA.IS", "BBB.IS"])
+        source.set_price("AAA.IS", 11.0)
+        await hub.poll_once(["AAA.IS", "BBB.IS"])
+        source.set_price("AAA.IS", 12.0)
+        await hub.poll_once(["AAA.IS", "BBB.IS"])
+        return await subscription.next_batch()
+
+    batch = asyncio.run(scenario())
+
+    assert sorted((q.ticker, q.price) for q in batch) == [
+        ("AAA.IS", 12.0),
+        ("BBB.IS", 20.0),
+    ]
+
+
+def test_user_subscription_picks_up_new_positions():
+    async def scenario():
+        hub = LiveQuoteHub(FakeQuoteSource({"AAA.IS": 10.0, "BBB.IS": 20.0}))
+        subscription = hub.subscribe({"AAA.IS"}, user_id="u1")
+        await hub.poll_once(["AAA.IS", "BBB.IS"])
+        await subscription.next_batch()
+
+        # u1 opens a BBB position that another user already held
+        hub.update_subscriptions(
+            [("u1", 1, "AAA.IS"), ("u1", 1, "BBB.IS"), ("u2", 2, "BBB.IS")]
+        )
+        return subscription.tickers, await subscription.next_batch()
+
+    tickers, batch = asyncio.run(scenario())
+
+    assert tickers == {"AAA.IS", "BBB.IS"}
+    assert [(q.ticker, q.price) for q in batch] == [("BBB.IS", 20.0)]
+
+
+def test_run_skips_polling_without_subscribers(monkeypatch):
+    scans = []
+
+    def fake_positions():
+        scans.append(1)
+        return [("u1", 1, "AAA.IS")]
+
+    monkeypatch.setattr(quote_service, "_all_held_positions", fake_positions)
+
+    async def scenario():
+        source = FakeQuoteSource({"AAA.IS": 10.0})
+        hub = LiveQuoteHub(source, interval_seconds=0.01)
+        hub.start()
+        await asyncio.sleep(0.05)
+        idle_calls = len(source.calls)
+
+        subscription = hub.subscribe(set(), user_id="u1")
+        batch = await asyncio.wait_for(subscription.next_batch(), 1)
+        await hub.stop()
+        return idle_calls, batch
+
+    idle_calls, batch = asyncio.run(scenario())
+
+    assert idle_calls == 0
+    assert [(q.ticker, q.price) for q in batch] == [("AAA.IS", 10.0)]
@@ -0,0 +1,117 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.routes import quotes
+from app.services import quote_service
+from app.services.quote_service import FakeQuoteSource, LiveQuoteHub
+
+USER_ID = "9d81edfe-1774-4ade-981f-5467cc306e31"
+
+
+def _make_app(hub: LiveQuoteHub, start_hub: bool = True) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.quote_hub = hub
+        if start_hub:
+            hub.start()
+        yield
+        await hub.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(quotes.router)
+    return app
+
+
+@pytest.fixture
+def source(monkeypatch):
+    """Fake provider plus stubbed auth and positions for one user."""
+    monkeypatch.setattr(
+        quotes, "_authenticate", lambda token: USER_ID if token == "good" else None
+    )
+    monkeypatch.setattr(quotes, "_held_tickers", lambda uid, pid: {"AAA.IS"})
+    monkeypatch.setattr(
+        quote_service, "_all_held_positions", lambda: [(USER_ID, 1, "AAA.IS")]
+    )
+    return FakeQuoteSource({"AAA.IS": 10.0})
+
+
+def _close_code(ws) -> int:
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        ws.receive_json()
+    return excinfo.value.code
+
+
+def test_snapshot_then_updates(source):
+    hub = LiveQuoteHub(source, interval_seconds=0.02)
+    with TestClient(_make_app(hub)) as client:
+        with client.websocket_connect("/quotes/ws") as ws:
+            ws.send_json({"token": "good"})
+            assert ws.receive_json() == {"type": "snapshot", "quotes": []}
+
+            # Subscribing wakes the poller, which pushes the first quote
+            first = ws.receive_json()
+            assert first["type"] == "update"
+            assert [(q["ticker"], q["price"]) for q in first["quotes"]] == [
+                ("AAA.IS", 10.0)
+            ]
+
+            # Binary frames from the client are ignored
+            ws.send_bytes(b"\x00")
+            source.set_price("AAA.IS", 11.0)
+            second = ws.receive_json()
+            assert [(q["ticker"], q["price"]) for q in second["quotes"]] == [
+                ("AAA.IS", 11.0)
+            ]
+
+
+@pytest.mark.parametrize(
+    "message",
+    [{"token": "bad"}, {}, {"token": 42}, {"token": "good", "portfolio_id": "x"}],
+)
+def test_bad_or_missing_token_closes_with_policy_violation(source, message):
+    hub = LiveQuoteHub(source)
+    with TestClient(_make_app(hub)) as client:
+        with client.websocket_connect("/quotes/ws") as ws:
+            ws.send_json(message)
+            assert _close_code(ws) == status.WS_1008_POLICY_VIOLATION
+
+
+def test_non_json_auth_message_closes_with_policy_violation(source):
+    hub = LiveQuoteHub(source)
+    with TestClient(_make_app(hub)) as client:
+        with client.websocket_connect("/quotes/ws") as ws:
+            ws.send_bytes(b"token")
+            assert _close_code(ws) == status.WS_1008_POLICY_VIOLATION
+
+
+def test_auth_timeout_closes_with_policy_violation(source, monkeypatch):
+    monkeypatch.setattr(quotes, "AUTH_TIMEOUT_SECONDS", 0.05)
+    hub = LiveQuoteHub(source)
+    with TestClient(_make_app(hub)) as client:
+        with client.websocket_connect("/quotes/ws") as ws:
+            assert _close_code(ws) == status.WS_1008_POLICY_VIOLATION
+
+
+def test_closes_when_poller_not_running(source):
+    hub = LiveQuoteHub(source)
+    with TestClient(_make_app(hub, start_hub=False)) as client:
+        with client.websocket_connect("/quotes/ws") as ws:
+            assert _close_code(ws) == status.WS_1013_TRY_AGAIN_LATER
+
+
+def test_pump_failure_closes_with_internal_error(source, monkeypatch):
+    async def broken_pump(websocket, subscription):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(quotes, "_pump", broken_pump)
+    hub = LiveQuoteHub(source)
+    with TestClient(_make_app(hub)) as client:
+        with client.websocket_connect("/quotes/ws") as ws:
+            ws.send_json({"token": "good"})
+            assert ws.receive_json()["type"] == "snapshot"
+            assert _close_code(ws) == status.WS_1011_INTERNAL_ERROR
+    assert not hub._subscriptions